@@ -17,15 +17,22 @@
 # under the License.
 """ASF Infrastructure Download Integrity Checker"""
 import os
+import io
+import json
 import gnupg
 import yaml
 import asfpy.messaging
 import hashlib
+import ssl
+import functools
+import sqlite3
 import requests
 import time
 import sys
+import re
 import string
 import typing
+import concurrent.futures
 
 # gnpug version 0.4.9 overwrites the key_id for two message types when it should not
 # fix up the code to reset the value
@@ -41,16 +48,28 @@ if gnupg.__version__ == '0.4.9':
     # add our override method
     gnupg.Verify.handle_status = override_handle_status
 
-CHUNK_SIZE = 4096
+CHUNK_SIZE = 1024 * 1024  # Read 1 MiB at a time when hashing files
 CFG = yaml.safe_load(open("./checker.yaml"))
 assert CFG.get("gpg_homedir"), "Please specify a homedir for the GPG keychain!"
 
 WHIMSY_MAIL_MAP = "https://whimsy.apache.org/public/committee-info.json"
 WHIMSY_PROJECTS_LIST = "https://whimsy.apache.org/public/public_ldap_projects.json"
-MAIL_MAP = requests.get(WHIMSY_MAIL_MAP).json()["committees"]
-PROJECTS_LIST = requests.get(WHIMSY_PROJECTS_LIST).json()["projects"]
-EMAIL_TEMPLATE = open("email-template.txt", "r").read()
+EMAIL_TEMPLATE = string.Template(open("email-template.txt", "r").read())
 INTERVAL = 1800  # Sleep for 30 min if --forever is set, then repeat
+WHIMSY_TTL = INTERVAL  # Check Whimsy for updated data at most once per scan interval
+WHIMSY_CACHE: typing.Dict[str, typing.Tuple[float, dict]] = {}  # URL -> (time fetched, JSON data)
+DIGESTERS = {  # Direct constructors, to skip the name lookup in hashlib.new() for every file
+    "md5": hashlib.md5,
+    "sha1": hashlib.sha1,
+    "sha256": hashlib.sha256,
+    "sha512": hashlib.sha512,
+}
+ErrorDict = typing.Dict[str, typing.List[str]]  # File paths and the errors found for them
+CPU_HASH_FEATURES = {  # CPU features (as named in /proc/cpuinfo) that hardware accelerated SHA digests depend on
+    "x86": ("sha_ni", "avx2", "avx512f"),
+    "arm": ("sha2", "sha512"),
+}
+HEX_TOKEN = re.compile(r"(?<![^ ])[^\S ]*([0-9a-fA-F]+)[^\S ]*(?![^ ])")  # Space-separated words made up of hex digits only
 CHECKSUM_LENGTHS = {
     "md5": 128,
     "sha1": 160,
@@ -59,31 +78,87 @@ CHECKSUM_LENGTHS = {
 }
 
 
-def alert_project(project: str, errors: dict):
+def fetch_whimsy(url: str) -> dict:
+    """Fetches a JSON document from Whimsy, falling back to earlier (in-memory or on-disk) copies if that fails"""
+    now = time.time()
+    if url in WHIMSY_CACHE and WHIMSY_CACHE[url][0] > now - WHIMSY_TTL:
+        return WHIMSY_CACHE[url][1]
+    cache_dir = CFG.get("cache_dir")
+    cache_filepath = os.path.join(cache_dir, os.path.basename(url)) if cache_dir else ""
+    cached = None
+    headers = {}
+    if cache_filepath and os.path.exists(cache_filepath):
+        try:
+            cached = json.load(open(cache_filepath, "r"))
+            if not isinstance(cached, dict) or "data" not in cached:
+                raise ValueError("no data found")
+        except (OSError, ValueError) as e:  # Truncated or otherwise unreadable, refetch it
+            print(f"WARNING: Ignoring unreadable cached copy of {url}: {e}")
+            cached = None
+    if cached:  # Revalidate the on-disk copy with a conditional GET
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+    try:
+        response = requests.get(url, headers=headers, timeout=60)
+        response.raise_for_status()
+        if response.status_code == 304 and cached:  # Not modified
+            WHIMSY_CACHE[url] = (now, cached["data"])
+            return cached["data"]
+        data = response.json()
+    except (requests.RequestException, ValueError) as e:  # Whimsy unreachable or not returning JSON
+        # Never let a Whimsy outage take the service down; use the latest copy we have, and retry next time.
+        if url in WHIMSY_CACHE:
+            print(f"WARNING: Could not fetch {url}, using the copy from {int(now - WHIMSY_CACHE[url][0])} seconds ago instead: {e}")
+            return WHIMSY_CACHE[url][1]
+        if cached:
+            print(f"WARNING: Could not fetch {url}, using the cached copy on disk instead: {e}")
+            return cached["data"]
+        raise
+    if cache_filepath:
+        # Write to a temporary file first, so that a crash or full disk never leaves a truncated copy behind
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            with open(cache_filepath + ".tmp", "w") as cache_file:
+                json.dump({
+                    "etag": response.headers.get("ETag"),
+                    "last_modified": response.headers.get("Last-Modified"),
+                    "data": data,
+                }, cache_file)
+            os.replace(cache_filepath + ".tmp", cache_filepath)
+        except OSError as e:
+            print(f"WARNING: Could not store a cached copy of {url}: {e}")
+    WHIMSY_CACHE[url] = (now, data)
+    return data
+
+
+def alert_project(project: str, errors: ErrorDict) -> None:
     """Sends a notification to the project and infra aboot errors that were found"""
     if errors:
-        if project not in PROJECTS_LIST:  # Only notify for actual, existing projects
+        if project not in fetch_whimsy(WHIMSY_PROJECTS_LIST)["projects"]:  # Only notify for actual, existing projects
             return
+        mail_map = fetch_whimsy(WHIMSY_MAIL_MAP)["committees"]
         project_list = f"private@{project}.apache.org"  # Standard naming
-        if project in MAIL_MAP:
-            project_list = f"private@{MAIL_MAP[project]['mail_list']}.apache.org"  # Special case for certain committees
+        if project in mail_map:
+            project_list = f"private@{mail_map[project]['mail_list']}.apache.org"  # Special case for certain committees
         recipients = [project_list]
         extra_recips = CFG.get("extra_recipients")
         if isinstance(extra_recips, list):
             recipients.extend(extra_recips)
-        errormsg = ""
+        errorparts = []
         for filepath, errorlines in errors.items():
-            errormsg += f"  - Errors were found while verifying {filepath}:\n"
-            for errorline in errorlines:
-                errormsg += f"    - {errorline}\n"
-            errormsg += "\n"
+            errorparts.append(f"  - Errors were found while verifying {filepath}:\n")
+            errorparts.extend(f"    - {errorline}\n" for errorline in errorlines)
+            errorparts.append("\n")
+        errormsg = "".join(errorparts)
         if "--debug" not in sys.argv:  # Don't send emails if --debug is specified
             print(f"Dispatching email to: {recipients}")
             asfpy.messaging.mail(
                 sender="ASF Infrastructure <root@apache.org>",
                 subject=f"Verification of download artifacts on dist.apache.org FAILED for {project}!",
                 recipients=recipients,
-                message=EMAIL_TEMPLATE.format(**locals())
+                message=EMAIL_TEMPLATE.substitute(errormsg=errormsg)
             )
         else:
             print(errormsg)
@@ -98,31 +173,179 @@ def load_keys(project: str, is_podling: bool) -> gnupg.GPG:
     if not os.path.isdir(project_gpg_dir):
         os.makedirs(project_gpg_dir, exist_ok=True)
     keychain = gnupg.GPG(gnupghome=project_gpg_dir, use_agent=True)
+    keys_files = []
     for root, _dirs, files in os.walk(project_dir):
         for filename in files:
             filepath = os.path.join(root, filename)
             if filename in ["KEYS", "KEYS.txt"]:
-                if "--quiet" not in sys.argv:
-                    print(f"Loading {filepath} into toolchain")
-                keychain.import_keys(open(filepath, "rb").read())
+                keys_files.append(filepath)
+    # Skip importing if none of the KEYS files have changed since they were last loaded into the toolchain
+    stamp_filepath = os.path.join(project_gpg_dir, ".keys_mtime")
+    stamp = "".join(f"{filepath}:{os.stat(filepath).st_mtime_ns}\n" for filepath in sorted(keys_files))
+    if os.path.exists(stamp_filepath) and open(stamp_filepath, "r").read() == stamp:
+        return keychain
+    imported_all = True
+    for filepath in keys_files:
+        if "--quiet" not in sys.argv:
+            print(f"Loading {filepath} into toolchain")
+        result = keychain.import_keys(open(filepath, "rb").read())
+        if not result.count or not result.fingerprints:  # gpg failures are reported in the result, not raised
+            imported_all = False
+    # Only skip future imports if all KEYS files were imported, so that failed imports are retried next time
+    if imported_all:
+        with open(stamp_filepath, "w") as stamp_file:
+            stamp_file.write(stamp)
     return keychain
 
 
+def advise_sequential(file: io.FileIO) -> None:
+    """Tells the kernel that a file will be read sequentially from start to end, so that it reads ahead more
+    aggressively and the disk is kept busy while the previous chunk is being hashed"""
+    if hasattr(os, "posix_fadvise"):  # Not available on all platforms
+        os.posix_fadvise(file.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+
+
+def read_chunks(file: io.FileIO) -> typing.Iterator[memoryview]:
+    """Reads an (unbuffered) file in chunks of CHUNK_SIZE bytes. Every chunk is read into the same buffer, so the
+    data must be used before the next chunk is read."""
+    advise_sequential(file)
+    buffer = bytearray(CHUNK_SIZE)
+    view = memoryview(buffer)
+    while True:
+        size = file.readinto(buffer)
+        if not size:
+            break
+        yield view[:size]
+
+
 def digest(filepath: str, method: str) -> str:
     """Calculates and returns the checksum of a file given a file path and a digest method (sha256, sha512 etc)"""
-    digester = hashlib.new(method)
-    with open(filepath, "rb") as file:
-        for chunk in iter(lambda: file.read(CHUNK_SIZE), b''):
+    constructor = DIGESTERS.get(method) or functools.partial(hashlib.new, method)
+    digester = constructor()
+    with open(filepath, "rb", buffering=0) as file:
+        for chunk in read_chunks(file):
             digester.update(chunk)
     return digester.hexdigest()
 
 
-def verify_checksum(filepath: str, method: str) -> list:
-    """Verifies a filepath against its checksum file, given a checksum method. Returns a list of errors if any found"""
+def digest_multi(filepath: str, methods: typing.List[str]) -> typing.Dict[str, str]:
+    """Calculates the checksums of a file for several digest methods at once, reading the file only once. Returns a
+    dict of digest methods and their checksums"""
+    digesters = {method: (DIGESTERS.get(method) or functools.partial(hashlib.new, method))() for method in methods}
+    with open(filepath, "rb", buffering=0) as file:
+        for chunk in read_chunks(file):
+            for digester in digesters.values():
+                digester.update(chunk)
+    return {method: digester.hexdigest() for method, digester in digesters.items()}
+
+
+class DigestCache:
+    """On-disk cache of checksums, keyed by file path and method and valid while mtime, ctime and size match"""
+
+    def __init__(self, path: str) -> None:
+        self.path = path  # The directory being scanned. Entries below it for files not seen in this scan are pruned.
+        self.db: typing.Optional[sqlite3.Connection] = None
+        self.new_entries: typing.List[typing.Tuple[str, str, int, int, int, str]] = []
+        self.seen: typing.Set[str] = set()
+        cache_dir = CFG.get("cache_dir")
+        if cache_dir:
+            try:
+                os.makedirs(cache_dir, exist_ok=True)
+                self.db = sqlite3.connect(os.path.join(cache_dir, "digests.db"), timeout=60)
+                self.db.execute("PRAGMA journal_mode=WAL")  # Readers do not block the writer, nor the other way around
+                with self.db:
+                    self.db.execute("CREATE TABLE IF NOT EXISTS digests (filepath TEXT, method TEXT, mtime INTEGER, "
+                                    "ctime INTEGER, size INTEGER, digest TEXT, PRIMARY KEY (filepath, method))")
+            except (OSError, sqlite3.Error) as e:
+                print(f"WARNING: Could not open the checksum cache, all files will be hashed: {e}")
+                if self.db:  # Only close, as pruning with nothing seen yet would wipe all entries of this project
+                    self.db.close()
+                    self.db = None
+
+    def get(self, filepath: str, method: str, stat: os.stat_result) -> typing.Optional[str]:
+        """Returns the cached checksum of a file, or None if the file has not been hashed before or has changed since"""
+        self.seen.add(filepath)
+        if self.db:
+            try:
+                row = self.db.execute("SELECT digest FROM digests WHERE filepath = ? AND method = ? AND mtime = ? AND "
+                                      "ctime = ? AND size = ?",
+                                      (filepath, method, stat.st_mtime_ns, stat.st_ctime_ns, stat.st_size)).fetchone()
+            except sqlite3.Error:
+                return None
+            if row:
+                return row[0]
+        return None
+
+    def put(self, filepath: str, method: str, stat: os.stat_result, value: str) -> None:
+        """Stores the checksum of a file in the cache, once the cache is closed"""
+        self.seen.add(filepath)
+        if self.db:
+            self.new_entries.append((filepath, method, stat.st_mtime_ns, stat.st_ctime_ns, stat.st_size, value))
+
+    def close(self) -> None:
+        """Writes all new entries to disk, prunes entries for files that no longer exist and closes the cache"""
+        if self.db:
+            try:
+                with self.db:
+                    self.db.executemany("INSERT OR REPLACE INTO digests VALUES (?, ?, ?, ?, ?, ?)", self.new_entries)
+                    self.db.execute("CREATE TEMP TABLE IF NOT EXISTS seen (filepath TEXT PRIMARY KEY)")
+                    self.db.execute("DELETE FROM seen")
+                    self.db.executemany("INSERT OR IGNORE INTO seen VALUES (?)", ((filepath,) for filepath in self.seen))
+                    prefix = os.path.join(self.path, "")
+                    self.db.execute("DELETE FROM digests WHERE substr(filepath, 1, ?) = ? AND filepath NOT IN "
+                                    "(SELECT filepath FROM seen)", (len(prefix), prefix))
+            except sqlite3.Error as e:
+                print(f"WARNING: Could not update the checksum cache: {e}")
+            self.db.close()
+            self.db = None
+        self.new_entries = []
+
+
+def cpu_hash_features() -> typing.Dict[str, typing.Optional[bool]]:
+    """Returns which SHA acceleration CPU features /proc/cpuinfo lists, or None (unknown) for each x86 feature"""
+    try:
+        with open("/proc/cpuinfo", "r") as cpuinfo:
+            for line in cpuinfo:
+                if line.startswith("flags") or line.startswith("Features"):  # x86 and ARM, respectively
+                    flags = set(line.split(":", 1)[1].split())
+                    features = CPU_HASH_FEATURES["x86" if line.startswith("flags") else "arm"]
+                    return {feature: feature in flags for feature in features}
+    except OSError:  # Not Linux
+        pass
+    return {feature: None for feature in CPU_HASH_FEATURES["x86"]}
+
+
+def check_digest_support() -> None:
+    """Reports the OpenSSL version, CPU hash features and SHA-256 throughput, warning about missing digest support"""
+    if "--quiet" not in sys.argv:
+        print(f"Using {ssl.OPENSSL_VERSION} for checksum calculations")
+        buffer = bytes(CHUNK_SIZE)
+        hashed = 0
+        digester = hashlib.sha256()
+        start_time = time.perf_counter()
+        while time.perf_counter() - start_time < 0.2:
+            digester.update(buffer)
+            hashed += len(buffer)
+        throughput = hashed / (time.perf_counter() - start_time) / 1024 / 1024
+        features = ", ".join(f"{feature}={'unknown' if available is None else 'yes' if available else 'no'}" for feature, available in cpu_hash_features().items())
+        print(f"SHA-256 @ {throughput:.0f} MiB/s, {features}")
+    if ssl.OPENSSL_VERSION_INFO < (1, 1, 1):
+        print(f"WARNING: {ssl.OPENSSL_VERSION} is older than 1.1.1 and may not use SHA-NI/AVX-512 accelerated digests. Please upgrade!")
+    for method in CFG.get("strong_checksums") + CFG.get("weak_checksums"):
+        if method not in hashlib.algorithms_available:
+            print(f"WARNING: Checksum method {method} is not supported by the linked OpenSSL library!")
+
+
+def verify_checksum(filepath: str, method: str, checksum_calculated: typing.Optional[str] = None,
+                    checksum_filepath: typing.Optional[str] = None) -> typing.List[str]:
+    """Verifies a filepath against its checksum file, given a checksum method. Returns a list of errors if any found.
+    If the checksum of the file has already been calculated, it can be passed as checksum_calculated. Likewise, the
+    path of the checksum file can be passed as checksum_filepath if it is already known."""
     filename = os.path.basename(filepath)
-    checksum_filepath = filepath + "." + method  # foo.sha256
-    if not os.path.exists(checksum_filepath):
-        checksum_filepath = filepath + "." + method.upper()  # foo.SHA256 fallback
+    if not checksum_filepath:
+        checksum_filepath = filepath + "." + method  # foo.sha256
+        if not os.path.exists(checksum_filepath):
+            checksum_filepath = filepath + "." + method.upper()  # foo.SHA256 fallback
     checksum_filename = os.path.basename(checksum_filepath)
     errors = []
     try:
@@ -133,14 +356,11 @@ def verify_checksum(filepath: str, method: str) -> list:
     except UnicodeError as e:
         errors.append(f"[CHK06] Checksum file {checksum_filename} contains garbage characters: {e}")
         return errors
-    checksum_value_trimmed = ""
     # Strip away comment lines first
-    for line in checksum_value.split("\n"):
-        if not line.startswith("//") and not line.startswith("#"):
-            checksum_value_trimmed += line.strip() + " "
-    checksum_options = checksum_value_trimmed.split(" ")
-    checksum_on_disk = "".join(x.strip() for x in checksum_options if all(c in string.hexdigits for c in x.strip())).lower()
-    checksum_calculated = digest(filepath, method)
+    checksum_value_trimmed = " ".join(line.strip() for line in checksum_value.split("\n") if not line.startswith("//") and not line.startswith("#"))
+    checksum_on_disk = "".join(HEX_TOKEN.findall(checksum_value_trimmed)).lower()
+    if checksum_calculated is None:
+        checksum_calculated = digest(filepath, method)
     if checksum_on_disk != checksum_calculated:
         errors.append(f"[CHK06] Checksum does not match checksum file {checksum_filename}!")
         errors.append(f"[CHK06] Calculated {method} checksum of {filename} was: {checksum_calculated}")
@@ -154,113 +374,202 @@ def verify_checksum(filepath: str, method: str) -> list:
     return errors
 
 
-def push_error(edict: dict, filepath: str, errmsg: typing.Union[str, list]):
+def index_keys(keychain: gnupg.GPG) -> typing.Dict[str, dict]:
+    """Lists all keys in a keychain once, returning a dict of key IDs (of main keys as well as their subkeys) and
+    the main key data they belong to. This saves spawning gpg again for every key that a signature is checked for."""
+    keys = {}
+    for key in keychain.list_keys():
+        keys[key["keyid"]] = key
+        for subkey_id in key.get("subkey_info", {}):
+            keys[subkey_id] = key
+    return keys
+
+
+def verify_signature(keychain: gnupg.GPG, filepath: str) -> gnupg.Verify:
+    """Verifies a file against its detached signature file (foo.asc) using the supplied keychain"""
+    with open(filepath + ".asc", "rb") as asc_file:
+        return keychain.verify_file(asc_file, data_filename=filepath)
+
+
+def push_error(edict: ErrorDict, filepath: str, errmsg: typing.Union[str, typing.List[str]]) -> None:
     """Push an error message to the error dict, creating an entry if none exists, otherwise appending to it"""
-    if filepath not in edict:
-        edict[filepath] = list()
+    errlist = edict.setdefault(filepath, [])
     if isinstance(errmsg, list):
-        edict[filepath].extend(errmsg)
+        errlist.extend(errmsg)
     else:
-        edict[filepath].append(errmsg)
+        errlist.append(errmsg)
+
+
+def scan_dir(path: str) -> typing.Iterator[typing.Tuple[str, typing.List[os.DirEntry]]]:
+    """Walks a directory tree, yielding each directory path along with the (sorted) entries of all files in it. The
+    entries cache their stat results, so no further stat calls are needed when checking them."""
+    try:
+        with os.scandir(path) as scanner:
+            entries = sorted(scanner, key=lambda entry: entry.name)
+    except OSError:  # Unreadable directory, skip it like os.walk does
+        return
+    yield path, [entry for entry in entries if not entry.is_dir(follow_symlinks=False)]
+    for entry in entries:
+        if entry.is_dir(follow_symlinks=False):
+            yield from scan_dir(entry.path)
 
 
-def verify_files(project: str, keychain: gnupg.GPG, is_podling: bool) -> dict:
-    """Verifies all download artifacts in a directory using the supplied keychain. Returns a dict of filenames and
-    their corresponding error messages if checksum or signature errors were found."""
-    errors: typing.Dict[str, str] = dict()
+def checksum_files_present(filepath: str, filenames: typing.Set[str], methods: typing.List[str]) -> typing.Dict[str, str]:
+    """Returns the checksum methods (in order) that a file has a foo.sha256/foo.SHA256 file for, and their paths"""
+    filename = os.path.basename(filepath)
+    checksum_files = {}
+    for method in methods:
+        if f"{filename}.{method}" in filenames:
+            checksum_files[method] = f"{filepath}.{method}"
+        elif f"{filename}.{method.upper()}" in filenames:  # Uppercase extension? :(
+            checksum_files[method] = f"{filepath}.{method.upper()}"
+    return checksum_files
+
+
+def verify_files(project: str, keychain: gnupg.GPG, is_podling: bool, threads: int = 1) -> ErrorDict:
+    """Verifies all download artifacts in a directory using the supplied keychain, hashing and checking signatures
+    with the given number of threads. Returns a dict of filenames and their corresponding error messages if checksum
+    or signature errors were found."""
+    errors: ErrorDict = dict()
     path = os.path.join(CFG["dist_dir"], project) if not is_podling else os.path.join(CFG["dist_dir"], "incubator", project)
     known_exts = CFG.get("known_extensions")
     strong_checksum_deadline = CFG.get("strong_checksum_deadline", 0)  # If applicable, only require sha1/md5 for older files
     # Check that we HAVE keys in the key chain
-    if not keychain.list_keys():
+    keys = index_keys(keychain)
+    if not keys:
         dl_files = os.listdir(path)
         if not dl_files or (len(dl_files) == 1 and dl_files[0] == ".htaccess"):  # Attic'ed project, skip it!
             return errors
         push_error(errors, "KEYS", "[CHK03] KEYS file could not be read or did not contain any valid signing keys!")
+    # Find all artifacts that must be verified, and their checksum and signature files. These are looked up in the
+    # set of names of the files in each directory, rather than probing the file system for every possible extension.
+    artifacts = []
+    stats = {}
+    strong_checksum_files = {}
+    weak_checksum_files = {}
+    signed_artifacts = []
+    for _root, entries in scan_dir(path):
+        filenames = {entry.name for entry in entries if entry.is_file()}  # Follows symlinks, so dangling ones are left out
+        for entry in entries:
+            extension = entry.name.split(".")[-1] if "." in entry.name else ""
+            if extension in known_exts and not entry.is_symlink():  # Skip symlinks
+                artifacts.append(entry.path)
+                stats[entry.path] = entry.stat(follow_symlinks=False)
+                strong_checksum_files[entry.path] = checksum_files_present(entry.path, filenames, CFG.get("strong_checksums"))
+                weak_checksum_files[entry.path] = checksum_files_present(entry.path, filenames, CFG.get("weak_checksums"))
+                if f"{entry.name}.asc" in filenames:
+                    signed_artifacts.append(entry.path)
+
+    # Calculate the checksums of all artifacts in parallel. hashlib releases the GIL while hashing, so this scales
+    # with the number of cores available. Files that have not changed since the last run are not hashed again.
+    digest_cache = DigestCache(path)
+    digests = {}
+    checksum_jobs = []
+    for filepath in artifacts:
+        # Only the first (preferred) strong checksum is calculated up front, the others are only needed if it fails
+        methods = []
+        for method in list(strong_checksum_files[filepath])[:1] + list(weak_checksum_files[filepath]):
+            cached_digest = digest_cache.get(filepath, method, stats[filepath])
+            if cached_digest:
+                digests[(filepath, method)] = cached_digest
+            else:
+                methods.append(method)
+        if methods:
+            checksum_jobs.append((filepath, methods))
+    # Detached signatures are verified alongside, as each verification runs in a gpg subprocess of its own.
+    try:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=threads) as executor:
+            verifications = executor.map(lambda filepath: verify_signature(keychain, filepath), signed_artifacts)
+            for (filepath, _methods), file_digests in zip(checksum_jobs, executor.map(lambda job: digest_multi(*job), checksum_jobs)):
+                for method, value in file_digests.items():
+                    digests[(filepath, method)] = value
+                    digest_cache.put(filepath, method, stats[filepath], value)
+            signatures = dict(zip(signed_artifacts, verifications))
+    finally:
+        digest_cache.close()
+
     # Now check all files...
-    for root, _dirs, files in os.walk(path):
-        for filename in sorted(files):
-            extension = filename.split(".")[-1] if "." in filename else ""
-            if extension in known_exts:
-                filepath = os.path.join(root, filename)
-                if os.path.islink(filepath):  # Skip symlinks
-                    continue
-                if "--quiet" not in sys.argv:
-                    print(f"Verifying {filepath}")
-                valid_checksums_found = 0
-                valid_weak_checksums_found = 0
-                # Verify strong checksums
-                for method in CFG.get("strong_checksums"):
-                    chkfile = filepath + "." + method
-                    chkfile_uc = filepath + "." + method.upper()  # Uppercase extension? :(
-                    if os.path.exists(chkfile) or os.path.exists(chkfile_uc):
-                        file_errors = verify_checksum(filepath, method)
-                        if file_errors:
-                            push_error(errors, filepath, file_errors)
-                        else:
-                            valid_checksums_found += 1
-
-                # Check older algos, but only count if release is old enough
-                for method in CFG.get("weak_checksums"):
-                    chkfile = filepath + "." + method
-                    chkfile_uc = filepath + "." + method.upper()  # Uppercase extension? :(
-                    if os.path.exists(chkfile) or os.path.exists(chkfile_uc):
-                        file_errors = verify_checksum(filepath, method)
-                        if file_errors:
-                            push_error(errors, filepath, file_errors)
-                        else:
-                            valid_weak_checksums_found += 1
-                            if valid_checksums_found == 0 and os.stat(filepath).st_mtime <= strong_checksum_deadline:
-                                valid_checksums_found += 1
-
-                # Ensure we had at least one valid checksum file of any kind (for old files).
-                if valid_checksums_found == 0 and os.stat(filepath).st_mtime <= strong_checksum_deadline:
-                    push_error(errors, filepath, f"[CHK02] No valid checksum files (.md5, .sha1, .sha256, .sha512) found for {filename}")
-
-                # Ensure we had at least one (valid) sha256 or sha512 file if strong checksums are enforced.
-                elif valid_checksums_found == 0:
-                    push_error(errors, filepath, f"[CHK02] No valid checksum files (.sha256, .sha512) found for {filename}")
-                    if valid_weak_checksums_found:
-                        push_error(errors, filepath, f"[CHK02] Only weak checksum files (.md5, .sha1) found for {filename}. Project MUST use sha256/sha512!")
-
-                # Verify detached signatures
-                asc_filepath = filepath + ".asc"
-                if os.path.exists(asc_filepath):
-                    verified = keychain.verify_file(open(asc_filepath, "rb"), data_filename=filepath)
-                    if not verified.valid:
-                        # Possible status values:
-                        # - 'no public key' - no further checks possible
-                        # - 'signature bad' - found the key, but the sig does not match
-                        # - 'signature valid' - implies key problem such as expired
-                        # - None - e.g. for non-empty but invalid signature (at present; this may be fixed)
-                        if verified.status is None or verified.status.startswith('error '):
-                            push_error(errors, filepath, f"[CHK05] The signature file {filename}.asc could not be used to verify the release artifact (corrupt sig?)")
-                        elif verified.status == 'no public key':
-                            push_error(errors, filepath, f"[CHK01] The signature file {filename}.asc was signed with a key not found in the project's KEYS file: {verified.key_id}")
-                        elif verified.status == 'signature bad':
-                            # unfortunately the current version of gnupg corrupts the key_id in this case
-                            push_error(errors, filepath, f"[CHK05] The signature file {filename}.asc could not be used to verify the release artifact (corrupt sig?)")
-                        elif verified.status == 'signature valid':
-                            # Assume we can get the key here, else how was the signature verified?
-                            key = keychain.list_keys(False, [verified.key_id])[0]
-                            fp_owner = key['uids'][0] # this is always in the main key
-                            if verified.key_status == 'signing key has expired':
-                                if verified.key_id == key['keyid']:
-                                    expires = key['expires']
-                                else: # must be a subkey
-                                    expires = key['subkey_info'][verified.key_id]['expires']
-                                if int(expires) < int(verified.sig_timestamp):
-                                    push_error(errors, filepath, f"[CHK04] Detached signature file {filename}.asc was signed by {fp_owner} ({verified.key_id}) but the key expired before the file was signed!")
-                            else:
-                                push_error(errors, filepath, f"[CHK04] Detached signature file {filename}.asc was signed by {fp_owner} ({verified.key_id}) but the key has status {verified.key_status}!")
-                        else:
-                            push_error(errors, filepath, f"[CHK05] Detached signature file {filename}.asc could not be used to verify {filename}: {verified.status}")
+    for filepath in artifacts:
+        filename = os.path.basename(filepath)
+        if "--quiet" not in sys.argv:
+            print(f"Verifying {filepath}")
+        valid_checksums_found = 0
+        valid_weak_checksums_found = 0
+        # Verify strong checksums, in order of preference. One valid strong checksum is enough.
+        for method, chkfile in strong_checksum_files[filepath].items():
+            file_errors = verify_checksum(filepath, method, digests.get((filepath, method)), chkfile)
+            if file_errors:
+                push_error(errors, filepath, file_errors)
+            else:
+                valid_checksums_found += 1
+                break
+
+        # Check older algos, but only count if release is old enough
+        for method, chkfile in weak_checksum_files[filepath].items():
+            file_errors = verify_checksum(filepath, method, digests.get((filepath, method)), chkfile)
+            if file_errors:
+                push_error(errors, filepath, file_errors)
+            else:
+                valid_weak_checksums_found += 1
+                if valid_checksums_found == 0 and stats[filepath].st_mtime <= strong_checksum_deadline:
+                    valid_checksums_found += 1
+
+        # Ensure we had at least one valid checksum file of any kind (for old files).
+        if valid_checksums_found == 0 and stats[filepath].st_mtime <= strong_checksum_deadline:
+            push_error(errors, filepath, f"[CHK02] No valid checksum files (.md5, .sha1, .sha256, .sha512) found for {filename}")
+
+        # Ensure we had at least one (valid) sha256 or sha512 file if strong checksums are enforced.
+        elif valid_checksums_found == 0:
+            push_error(errors, filepath, f"[CHK02] No valid checksum files (.sha256, .sha512) found for {filename}")
+            if valid_weak_checksums_found:
+                push_error(errors, filepath, f"[CHK02] Only weak checksum files (.md5, .sha1) found for {filename}. Project MUST use sha256/sha512!")
+
+        # Verify detached signatures
+        if filepath in signatures:
+            verified = signatures[filepath]
+            if not verified.valid:
+                # Possible status values:
+                # - 'no public key' - no further checks possible
+                # - 'signature bad' - found the key, but the sig does not match
+                # - 'signature valid' - implies key problem such as expired
+                # - None - e.g. for non-empty but invalid signature (at present; this may be fixed)
+                if verified.status is None or verified.status.startswith('error '):
+                    push_error(errors, filepath, f"[CHK05] The signature file {filename}.asc could not be used to verify the release artifact (corrupt sig?)")
+                elif verified.status == 'no public key':
+                    push_error(errors, filepath, f"[CHK01] The signature file {filename}.asc was signed with a key not found in the project's KEYS file: {verified.key_id}")
+                elif verified.status == 'signature bad':
+                    # unfortunately the current version of gnupg corrupts the key_id in this case
+                    push_error(errors, filepath, f"[CHK05] The signature file {filename}.asc could not be used to verify the release artifact (corrupt sig?)")
+                elif verified.status == 'signature valid':
+                    # Assume we can get the key here, else how was the signature verified?
+                    key = keys.get(verified.key_id) or keychain.list_keys(False, [verified.key_id])[0]
+                    fp_owner = key['uids'][0] # this is always in the main key
+                    if verified.key_status == 'signing key has expired':
+                        if verified.key_id == key['keyid']:
+                            expires = key['expires']
+                        else: # must be a subkey
+                            expires = key['subkey_info'][verified.key_id]['expires']
+                        if int(expires) < int(verified.sig_timestamp):
+                            push_error(errors, filepath, f"[CHK04] Detached signature file {filename}.asc was signed by {fp_owner} ({verified.key_id}) but the key expired before the file was signed!")
+                    else:
+                        push_error(errors, filepath, f"[CHK04] Detached signature file {filename}.asc was signed by {fp_owner} ({verified.key_id}) but the key has status {verified.key_status}!")
                 else:
-                    push_error(errors, filepath, f"[CHK05] No detached signature file could be found for {filename} - all artifact bundles MUST have an accompanying .asc signature file!")
+                    push_error(errors, filepath, f"[CHK05] Detached signature file {filename}.asc could not be used to verify {filename}: {verified.status}")
+        else:
+            push_error(errors, filepath, f"[CHK05] No detached signature file could be found for {filename} - all artifact bundles MUST have an accompanying .asc signature file!")
     return errors
 
 
-def main():
+def scan_project(project: str, is_podling: bool, threads: int) -> typing.Tuple[str, ErrorDict, int]:
+    """Loads keys for and verifies a project in a worker process, returning the project, its errors and the time taken"""
+    start_time_project = time.time()
+    keychain = load_keys(project, is_podling)
+    errors = verify_files(project, keychain, is_podling, threads)
+    time_taken = int(time.time() - start_time_project)
+    return project, errors, time_taken
+
+
+def main() -> None:
     if "--debug" in sys.argv:
         print("DEBUG MODE ENABLED. No emails will be sent.")
     if "--debug_plugin" in sys.argv:
@@ -269,6 +578,7 @@ def main():
         logger.setLevel('DEBUG')
         logger.addHandler(logging.StreamHandler())
         logger.debug("Plugin debug enabled.")
+    check_digest_support()
     start_time = time.time()
     gpg_home = CFG["gpg_homedir"]
     if not os.path.isdir(gpg_home):
@@ -291,19 +601,21 @@ def main():
     projects = [p for p in projects if f"-{p}" not in sys.argv]  # to exclude POI: main.py -poi
 
     while True:
-        for project in sorted(projects):
-            sys.stdout.write(f"- Scanning {project}...")
-            start_time_project = time.time()
-            keychain = load_keys(project, project in podlings)
-            errors = verify_files(project, keychain, project in podlings)
-            time_taken = int(time.time() - start_time_project)
-            if errors:
-                sys.stdout.write(f"BAD! (scan time: {time_taken} seconds)\n")
-                sys.stdout.flush()
-                alert_project(project, errors)
-            else:
-                sys.stdout.write(f"ALL GOOD! (scan time: {time_taken} seconds)\n")
-                sys.stdout.flush()
+        # Split the CPU cores between the projects scanned in parallel and the threads hashing each project's files
+        cpu_count = os.cpu_count() or 1
+        max_workers = max(1, min(CFG.get("max_workers") or cpu_count, len(projects)))
+        threads = CFG.get("threads_per_project") or min(8, max(1, cpu_count // max_workers))
+        with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(scan_project, project, project in podlings, threads) for project in sorted(projects)]
+            for future in concurrent.futures.as_completed(futures):
+                project, errors, time_taken = future.result()
+                if errors:
+                    sys.stdout.write(f"- Scanning {project}...BAD! (scan time: {time_taken} seconds)\n")
+                    sys.stdout.flush()
+                    alert_project(project, errors)
+                else:
+                    sys.stdout.write(f"- Scanning {project}...ALL GOOD! (scan time: {time_taken} seconds)\n")
+                    sys.stdout.flush()
         total_time_taken = int(time.time() - start_time)
         print(f"Done scanning {len(projects)} projects in {total_time_taken} seconds.")
         if "--forever" in sys.argv:
@@ -21,6 +21,7 @@
 from pprint import pprint
 import os
 import sys
+import tempfile
 import yaml
 
 # Expected errors
@@ -49,19 +50,97 @@ def alert_project_intercept(project: str, errors: dict):
                 total_errors += len(unexpecteds)
                 results[filepath] = unseen
 
+class FakeResponse:
+    """Canned Whimsy response, for checking fetch_whimsy without network access"""
+    def __init__(self, status_code: int, data=None, headers=None):
+        self.status_code = status_code
+        self.data = data
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        if self.data is None:
+            raise ValueError("not JSON")
+        return self.data
+
+def check_fetch_whimsy(main):
+    """Checks the conditional GET, fallback and outage handling of main.fetch_whimsy"""
+    global total_errors
+    import requests
+    url = main.WHIMSY_MAIL_MAP
+    responses = []
+    sent_headers = []
+    def fake_get(_url, headers=None, timeout=None):
+        sent_headers.append(headers)
+        response = responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+    def check(description, expected, actual):
+        global total_errors
+        if expected != actual:
+            print(f"fetch_whimsy: {description}: expected {expected}, got {actual}")
+            total_errors += 1
+    real_get, cache_dir = main.requests.get, main.CFG.get("cache_dir")
+    main.requests.get = fake_get
+    with tempfile.TemporaryDirectory() as tmpdir:
+        try:
+            main.CFG["cache_dir"] = tmpdir
+            responses.append(FakeResponse(200, {"v": 1}, {"ETag": "e1"}))
+            check("fresh fetch", {"v": 1}, main.fetch_whimsy(url))
+            main.WHIMSY_CACHE.clear()
+            responses.append(FakeResponse(304))
+            check("revalidated copy", {"v": 1}, main.fetch_whimsy(url))
+            check("conditional GET", {"If-None-Match": "e1"}, sent_headers[-1])
+            main.WHIMSY_CACHE.clear()
+            responses.append(FakeResponse(200))  # Not JSON
+            check("on-disk copy when Whimsy returns garbage", {"v": 1}, main.fetch_whimsy(url))
+            main.CFG["cache_dir"] = None
+            main.WHIMSY_CACHE[url] = (0, {"v": 2})  # Stale in-memory copy
+            responses.append(requests.ConnectionError("Whimsy is down"))
+            check("stale copy during outage", {"v": 2}, main.fetch_whimsy(url))
+            main.WHIMSY_CACHE.clear()
+            responses.append(requests.ConnectionError("Whimsy is down"))
+            try:
+                main.fetch_whimsy(url)
+                check("outage without any copy", "exception", "no exception")
+            except requests.ConnectionError:
+                pass
+        finally:
+            main.requests.get, main.CFG["cache_dir"] = real_get, cache_dir
+            main.WHIMSY_CACHE.clear()
+
+def no_hashing(filepath, methods):
+    raise AssertionError(f"{filepath} was hashed again, although its checksums should have been cached")
+
+def check_results():
+    """Reports any expected errors that were not seen during the last scan"""
+    global total_errors
+    for project in RESULTS:
+        for file in RESULTS[project]:
+            print(f"Expected error for {project} {file} : {RESULTS[project][file]}")
+            total_errors += 1
+
 if __name__ == "__main__":
     # Ensure old modification date for testing
     os.utime('dist/httpd/test_oldoldext.zip', (0, 0))
     # Hack to intercept alert messages
     sys.path.insert(0, '..')
     import main
+    check_fetch_whimsy(main)
     main.alert_project = alert_project_intercept
-    main.main()
-    # any errors unseen?
-    for project in RESULTS:
-        for file in RESULTS[project]:
-            print(f"Expected error for {project} {file} : {RESULTS[project][file]}")
-            total_errors += 1
+    with tempfile.TemporaryDirectory() as cache_dir:
+        main.CFG["cache_dir"] = cache_dir
+        # Cold run: every artifact is hashed, and the checksums are cached
+        main.main()
+        check_results()
+        # Warm run: all checksums must now come from the cache, with the same results
+        RESULTS = yaml.safe_load(open("./results.yaml"))
+        main.digest_multi = no_hashing
+        main.main()
+        check_results()
     print(f"Found {total_errors} errors")
     if total_errors:
-        sys.exit(1)
\ No newline at end of file
+        sys.exit(1)